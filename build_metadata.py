@@ -0,0 +1,20 @@
+# build_metadata.py
+# Convierte diccionario_datos_scraping.txt (un literal de Python) a JSON, que es lo que carga
+# la Lambda en cada arranque en frío. Ejecutar antes de desplegar cada vez que cambie el .txt:
+#   python build_metadata.py
+import ast
+import os
+import orjson
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    source_path = os.path.join(script_dir, 'diccionario_datos_scraping.txt')
+    target_path = os.path.join(script_dir, 'diccionario_datos_scraping.json')
+    with open(source_path, 'r', encoding='utf-8') as f:
+        metadata = ast.literal_eval(f.read())
+    with open(target_path, 'wb') as f:
+        f.write(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
+    print(f"Metadatos convertidos: {source_path} -> {target_path}")
+
+if __name__ == '__main__':
+    main()
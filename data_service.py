@@ -1,18 +1,64 @@
 # data_service.py
 from abc import ABC, abstractmethod
-import ast
 import boto3
+import orjson
 import pandas as pd
+import numpy as np
 import os
-import decimal
-import json 
+import time
+from collections import defaultdict
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 
-# Helper para convertir los tipos Decimal de DynamoDB a float para pandas
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, decimal.Decimal):
-            return float(o)
-        return super(DecimalEncoder, self).default(o)
+# Columnas que llegan como Decimal desde DynamoDB y se usan en cálculos
+NUMERIC_COLUMNS = ('price', 'currency_id', 'm2')
+# Columnas de conteo (dormitorios, baños); si faltan o no son válidas se toman como 0
+COUNT_COLUMNS = ('bedrooms', 'bathrooms')
+# Almacenamiento de los valores crudos en el DataFrame cacheado: float32 (~7 cifras significativas)
+# sobra para precios y superficies, int16 para los conteos. Los cálculos derivados se hacen en float64.
+NUMERIC_DTYPE = np.float32
+COUNT_DTYPE = np.int16
+COUNT_BOUNDS = np.iinfo(COUNT_DTYPE)
+# Columnas de tipo lista; si faltan en un item se toman como lista vacía
+LIST_COLUMNS = ('facilities',)
+# Atributos que se leen de la tabla (el resto no se usa en el dashboard)
+PROJECTED_COLUMNS = (
+    'id', 'price', 'currency_id', 'm2', 'property_type_id',
+    'facilities', 'neighborhood', 'bedrooms', 'bathrooms',
+)
+# Columnas de texto de baja cardinalidad por las que agrupa el dashboard
+CATEGORY_COLUMNS = ('neighborhood', 'property_type_name')
+# Segmentos del scan paralelo (uno por hilo)
+SCAN_SEGMENTS = 8
+# Tiempo durante el cual se reutiliza el resultado del scan entre invocaciones
+CACHE_TTL_SECONDS = 90
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _to_int(value):
+    # Los conteos no enteros (p. ej. Decimal('1.5') baños) o fuera del rango de COUNT_DTYPE
+    # se tratan como inválidos en lugar de truncarse o desbordar el buffer
+    try:
+        count = int(value)
+    except (TypeError, ValueError, ArithmeticError):
+        return 0
+    if count != value or not COUNT_BOUNDS.min <= count <= COUNT_BOUNDS.max:
+        return 0
+    return count
+
+def _convert_prices(price, m2, currency_id, rate):
+    # Conversión a USD y precio por m2 escribiendo directamente en los buffers de salida,
+    # sin arrays temporales para las ramas de np.where.
+    # Las columnas derivadas son cocientes que float32 no representa al centavo: se guardan en float64.
+    price_usd = price.astype(np.float64)
+    np.divide(price_usd, rate, out=price_usd, where=currency_id == 6)
+    price_per_m2_usd = np.zeros_like(price_usd)
+    np.divide(price_usd, m2, out=price_per_m2_usd, where=m2 > 0)
+    return price_usd, price_per_m2_usd
 
 class DataService(ABC):
     @abstractmethod
@@ -26,12 +72,24 @@ class DynamoDBService(DataService):
         # Cargar metadatos desde el archivo incluido en el paquete Lambda
         self._filters_metadata = self._load_metadata_from_file()
         self.pen_to_usd_rate = self._get_pen_to_usd_rate()
+        # Mapeos estáticos de ids a nombres, construidos una sola vez
+        self._type_mapping = {
+            opt['property_type_id']: opt['name']
+            for opt in self._filters_metadata.get('Filter:propertyType', {}).get('options', [])
+        }
+        self._facilities_mapping = {
+            str(opt['id']): opt['nombre']
+            for opt in self._filters_metadata.get('Filter:facilities', {}).get('options', [])
+        }
+        # (DataFrame procesado, instante en que se cargó)
+        self._cache = (None, 0.0)
 
     def _load_metadata_from_file(self):
+        # JSON generado desde diccionario_datos_scraping.txt con build_metadata.py
         script_dir = os.path.dirname(__file__)
-        file_path = os.path.join(script_dir, 'diccionario_datos_scraping.txt')
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return ast.literal_eval(f.read())
+        file_path = os.path.join(script_dir, 'diccionario_datos_scraping.json')
+        with open(file_path, 'rb') as f:
+            return orjson.loads(f.read())
 
     def _get_pen_to_usd_rate(self):
         # ... (mismo código que la versión local)
@@ -43,48 +101,119 @@ class DynamoDBService(DataService):
 
     def _map_property_types(self, df):
         # ... (mismo código que la versión local)
-        type_mapping = {
-            opt['property_type_id']: opt['name']
-            for opt in self._filters_metadata.get('Filter:propertyType', {}).get('options', [])
-        }
-        df['property_type_name'] = df['property_type_id'].map(type_mapping).fillna('No especificado')
+        df['property_type_name'] = df['property_type_id'].map(self._type_mapping).fillna('No especificado')
         return df
 
-    def _map_facilities(self, facility_ids):
-        # ... (mismo código que la versión local)
-        if not isinstance(facility_ids, list):
-            return []
-        facilities_mapping = {
-            str(opt['id']): opt['nombre']
-            for opt in self._filters_metadata.get('Filter:facilities', {}).get('options', [])
-        }
-        return [facilities_mapping.get(str(fid), 'Desconocido') for fid in facility_ids]
+    def _map_facilities(self, df):
+        # Se aplanan todas las listas, se mapean en una sola pasada y se vuelven a partir por offsets
+        facility_lists = df['facilities'].to_numpy()
+        lengths = np.fromiter(map(len, facility_lists), dtype=np.int64, count=len(facility_lists))
+        get_name = self._facilities_mapping.get
+        names = [get_name(str(fid), 'Desconocido') for fid in chain.from_iterable(facility_lists)]
+        ends = np.cumsum(lengths).tolist()
+        starts = [0] + ends[:-1]
+        df['facilities_names'] = [names[start:end] for start, end in zip(starts, ends)]
+        return df
+
+    @staticmethod
+    def _append_items(columns, items, n_rows):
+        # Acumula los items por columna; los atributos ausentes en un item se rellenan con None
+        for item in items:
+            for key, value in item.items():
+                column = columns[key]
+                if len(column) < n_rows:
+                    column.extend([None] * (n_rows - len(column)))
+                column.append(value)
+            n_rows += 1
+        return n_rows
+
+    @staticmethod
+    def _build_dataframe(columns, n_rows):
+        # Un buffer contiguo por columna: las numéricas pasan de Decimal a float32/int16 sin objetos intermedios
+        data = {}
+        for key in NUMERIC_COLUMNS + COUNT_COLUMNS + LIST_COLUMNS:
+            columns.setdefault(key, [])
+        for key, values in columns.items():
+            values.extend([None] * (n_rows - len(values)))
+            if key in NUMERIC_COLUMNS:
+                data[key] = np.fromiter(map(_to_float, values), dtype=NUMERIC_DTYPE, count=n_rows)
+            elif key in COUNT_COLUMNS:
+                data[key] = np.fromiter(map(_to_int, values), dtype=COUNT_DTYPE, count=n_rows)
+            elif key in LIST_COLUMNS:
+                data[key] = [[] if v is None else v for v in values]
+            else:
+                data[key] = values
+        # copy=False: pandas adopta cada buffer tal cual, sin consolidarlos en un bloque 2D
+        return pd.DataFrame(data, copy=False)
+
+    def _scan_segment(self, segment, total_segments):
+        # Cada segmento acumula sus propias columnas; se combinan al terminar todos.
+        # Se usa el paginador del cliente (thread-safe) en lugar del recurso Table, que no lo es.
+        columns = defaultdict(list)
+        n_rows = 0
+        paginator = self.dynamodb.meta.client.get_paginator('scan')
+        pages = paginator.paginate(
+            TableName=self.table.name,
+            Segment=segment,
+            TotalSegments=total_segments,
+            # Solo se traen los atributos que usa el dashboard; los alias evitan choques con palabras reservadas
+            ProjectionExpression=', '.join(f'#{col}' for col in PROJECTED_COLUMNS),
+            ExpressionAttributeNames={f'#{col}': col for col in PROJECTED_COLUMNS},
+        )
+        for page in pages:
+            n_rows = self._append_items(columns, page['Items'], n_rows)
+        return columns, n_rows
+
+    @staticmethod
+    def _merge_segments(segments):
+        columns = defaultdict(list)
+        n_rows = 0
+        for segment_columns, segment_rows in segments:
+            for key, values in segment_columns.items():
+                column = columns[key]
+                if len(column) < n_rows:
+                    column.extend([None] * (n_rows - len(column)))
+                values.extend([None] * (segment_rows - len(values)))
+                column.extend(values)
+            n_rows += segment_rows
+        return columns, n_rows
 
     def get_processed_properties(self):
-        # Escanear toda la tabla de DynamoDB
-        response = self.table.scan()
-        items = response['Items']
+        # En invocaciones "cálidas" se reutiliza el DataFrame ya procesado mientras no expire.
+        # El DataFrame cacheado es compartido: quien lo use no debe modificarlo in-place.
+        cached_df, cached_at = self._cache
+        if cached_df is not None and time.monotonic() - cached_at < CACHE_TTL_SECONDS:
+            return cached_df
+
+        properties_df = self._load_properties()
+        self._cache = (properties_df, time.monotonic())
+        return properties_df
 
-        # DynamoDB puede paginar los resultados. Para un dataset grande, habría que iterar.
-        while 'LastEvaluatedKey' in response:
-            response = self.table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-            items.extend(response['Items'])
+    def _load_properties(self):
+        # Escanear toda la tabla de DynamoDB con un scan paralelo por segmentos
+        with ThreadPoolExecutor(max_workers=SCAN_SEGMENTS) as executor:
+            futures = [executor.submit(self._scan_segment, i, SCAN_SEGMENTS) for i in range(SCAN_SEGMENTS)]
+            columns, n_rows = self._merge_segments(f.result() for f in futures)
 
-        properties_df = pd.DataFrame(items)
-        if properties_df.empty:
+        if n_rows == 0:
             return pd.DataFrame() # Devolver DF vacío si no hay datos
+        properties_df = self._build_dataframe(columns, n_rows)
 
         # --- Procesamiento idéntico al local ---
-        properties_df['price_usd'] = properties_df.apply(
-            lambda row: float(row['price']) / self.pen_to_usd_rate if row.get('currency_id') == 6 else float(row.get('price', 0)),
-            axis=1
-        )
-        properties_df['price_per_m2_usd'] = properties_df.apply(
-            lambda row: row['price_usd'] / float(row['m2']) if row.get('m2') and float(row['m2']) > 0 else 0,
-            axis=1
-        )
+        # Conversión vectorizada: una pasada por columna en lugar de un lambda por fila
+        price = properties_df['price'].to_numpy()
+        m2 = properties_df['m2'].to_numpy()
+        currency_id = properties_df['currency_id'].to_numpy()
+
+        price_usd, price_per_m2_usd = _convert_prices(price, m2, currency_id, self.pen_to_usd_rate)
+        properties_df['price_usd'] = price_usd
+        properties_df['price_per_m2_usd'] = price_per_m2_usd
         properties_df = self._map_property_types(properties_df)
-        properties_df['facilities_names'] = properties_df['facilities'].apply(self._map_facilities)
+        properties_df = self._map_facilities(properties_df)
+
+        # Columnas de baja cardinalidad usadas en groupby: se codifican como categorías
+        for key in CATEGORY_COLUMNS:
+            properties_df[key] = properties_df[key].astype('category')
 
         return properties_df
 
@@ -1,30 +1,19 @@
 # handler.py
-import json
-import decimal
+import orjson
 import pandas as pd
 import numpy as np
 from collections import Counter
+from itertools import chain
 from data_service import get_data_service
 
+# Copy-on-Write: assign() y los cortes del DataFrame comparten memoria en lugar de copiar el frame.
+# Desde pandas 3.0 es el comportamiento por defecto y la opción quedó obsoleta.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
 # Se inicializa el servicio una vez para que pueda ser reutilizado en ejecuciones "cálidas" de Lambda
 data_service = get_data_service()
 
-# ... (El resto de la clase DecimalEncoder no cambia)
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, decimal.Decimal):
-            if o % 1 > 0:
-                return float(o)
-            else:
-                return int(o)
-        if isinstance(o, np.integer):
-            return int(o)
-        if isinstance(o, np.floating):
-            return float(o)
-        if isinstance(o, np.ndarray):
-            return o.tolist()
-        return super(DecimalEncoder, self).default(o)
-
 def get_dashboard_metrics(event, context):
     """
     Esta es la función principal que API Gateway llamará.
@@ -38,36 +27,32 @@ def get_dashboard_metrics(event, context):
             return {
                 "statusCode": 200,
                 "headers": { "Access-Control-Allow-Origin": "*" },
-                "body": json.dumps({"message": "No hay propiedades en la base de datos."})
+                "body": orjson.dumps({"message": "No hay propiedades en la base de datos."}).decode()
             }
 
-        # --- INICIO DE LA CORRECCIÓN ---
-        # Se convierten explícitamente las columnas de Decimal a un tipo numérico
-        # que pandas pueda utilizar para operaciones matemáticas. Esta es la solución al error.
-        properties_df['m2'] = pd.to_numeric(properties_df['m2'], errors='coerce')
-        properties_df['price_usd'] = pd.to_numeric(properties_df['price_usd'], errors='coerce')
-        properties_df.dropna(subset=['m2', 'price_usd'], inplace=True) # Elimina filas si la conversión falló
-        # --- FIN DE LA CORRECCIÓN ---
+        # 2. Conversión a float64 y cálculo de 'price_per_m2_usd' en una sola pasada sobre arrays
+        # (los valores no convertibles quedan como NaN y se descartan con la máscara).
+        # El DataFrame cacheado guarda float32; los cálculos y promedios se hacen en float64
+        # para que la respuesta no arrastre el redondeo de float32.
+        price_usd = properties_df['price_usd'].to_numpy(dtype=np.float64, na_value=np.nan)
+        m2 = properties_df['m2'].to_numpy(dtype=np.float64, na_value=np.nan)
+        price_per_m2_usd = np.divide(price_usd, m2, out=np.zeros_like(price_usd), where=m2 > 0)
 
-
-        # 2. Recalcular la columna 'price_per_m2_usd' para asegurar la precisión
-        m2_for_calc = properties_df['m2'].replace(0, np.nan) 
-        properties_df['price_per_m2_usd'] = properties_df['price_usd'] / m2_for_calc
-        properties_df['price_per_m2_usd'].replace([np.inf, -np.inf], np.nan, inplace=True)
-        properties_df['price_per_m2_usd'].fillna(0, inplace=True)
-        
         # 3. Filtrado de Outliers
         min_m2 = 15
         min_price_per_m2 = 50
         max_price_per_m2 = 15000
-        
-        initial_count = len(properties_df)
-        
-        properties_df_filtered = properties_df[
-            (properties_df['m2'] >= min_m2) &
-            (properties_df['price_per_m2_usd'] >= min_price_per_m2) &
-            (properties_df['price_per_m2_usd'] <= max_price_per_m2)
-        ].copy()
+
+        valid = np.isfinite(price_usd) & np.isfinite(m2)
+        initial_count = int(np.count_nonzero(valid))
+
+        # Una única máscara booleana y un único corte del DataFrame (sin .copy(): nada lo modifica después)
+        mask = valid & (m2 >= min_m2) & (price_per_m2_usd >= min_price_per_m2) & (price_per_m2_usd <= max_price_per_m2)
+        properties_df_filtered = properties_df.iloc[mask].assign(
+            m2=m2[mask],
+            price_usd=price_usd[mask],
+            price_per_m2_usd=price_per_m2_usd[mask]
+        )
         
         filtered_count = len(properties_df_filtered)
         print(f"Filtrado de outliers: Se pasó de {initial_count} a {filtered_count} propiedades.")
@@ -86,29 +71,40 @@ def get_dashboard_metrics(event, context):
         if pd.isna(avg_m2): avg_m2 = 0
         if pd.isna(avg_price_per_m2_usd): avg_price_per_m2_usd = 0
 
+        # Las agregaciones se hacen una tras otra, cada una sobre el subconjunto de columnas que usa
         # Análisis por Distrito
-        district_analysis = properties_df_filtered.groupby('neighborhood')['price_per_m2_usd'].mean().sort_values(ascending=False)
-        top_expensive_districts = district_analysis.head(5).reset_index().to_dict(orient='records')
-        top_affordable_districts = district_analysis.tail(5).sort_values(ascending=True).reset_index().to_dict(orient='records')
+        district_analysis = properties_df_filtered[['neighborhood', 'price_per_m2_usd']].groupby('neighborhood', observed=True)['price_per_m2_usd'].mean()
+        top_expensive_districts = district_analysis.nlargest(5).reset_index().to_dict(orient='records')
+        top_affordable_districts = district_analysis.nsmallest(5).reset_index().to_dict(orient='records')
         
         # Análisis por Tipo de Propiedad
-        prop_type_analysis_df = properties_df_filtered.groupby('property_type_name').agg(
+        # Todas las agregaciones son nombres de función ('count', 'mean') para usar la ruta Cython;
+        # sort=False porque el resultado se ordena después por 'count'
+        prop_type_columns = ['property_type_name', 'id', 'price_usd', 'm2', 'price_per_m2_usd']
+        prop_type_analysis_df = properties_df_filtered[prop_type_columns].groupby('property_type_name', observed=True, sort=False).agg(
             count=('id', 'count'),
             avg_price_usd=('price_usd', 'mean'),
             avg_m2=('m2', 'mean'),
             avg_price_per_m2_usd=('price_per_m2_usd', 'mean')
         ).reset_index()
         
-        prop_type_analysis_df.fillna(0, inplace=True)
+        # NaN/inf a 0 en una sola pasada sobre las columnas de promedios
+        # ('property_type_name' es categórica y no admite el valor 0)
+        avg_columns = ['avg_price_usd', 'avg_m2', 'avg_price_per_m2_usd']
+        prop_type_analysis_df[avg_columns] = np.nan_to_num(
+            prop_type_analysis_df[avg_columns].to_numpy(), nan=0.0, posinf=0.0, neginf=0.0
+        )
         prop_type_analysis = prop_type_analysis_df.sort_values(by='count', ascending=False).to_dict(orient='records')
         
         # Análisis de Facilities (Comodidades)
-        all_facilities = [facility for sublist in properties_df_filtered['facilities_names'] for facility in sublist]
-        top_facilities = Counter(all_facilities).most_common(10)
+        top_facilities = Counter(chain.from_iterable(properties_df_filtered['facilities_names'].values)).most_common(10)
         
         # Correlación Precio vs. Características
-        price_by_bedrooms = properties_df_filtered[properties_df_filtered['bedrooms'] > 0].groupby('bedrooms')['price_usd'].mean().reset_index().to_dict(orient='records')
-        price_by_bathrooms = properties_df_filtered[properties_df_filtered['bathrooms'] > 0].groupby('bathrooms')['price_usd'].mean().reset_index().to_dict(orient='records')
+        # El filtro '> 0' se aplica sobre las dos columnas necesarias: así no se copia el resto del frame
+        bedrooms_df = properties_df_filtered[['bedrooms', 'price_usd']]
+        bathrooms_df = properties_df_filtered[['bathrooms', 'price_usd']]
+        price_by_bedrooms = bedrooms_df[bedrooms_df['bedrooms'] > 0].groupby('bedrooms')['price_usd'].mean().reset_index().to_dict(orient='records')
+        price_by_bathrooms = bathrooms_df[bathrooms_df['bathrooms'] > 0].groupby('bathrooms')['price_usd'].mean().reset_index().to_dict(orient='records')
 
         # 5. Ensamblar el diccionario de respuesta
         response_data = {
@@ -137,7 +133,7 @@ def get_dashboard_metrics(event, context):
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Credentials": True
             },
-            "body": json.dumps(response_data, cls=DecimalEncoder)
+            "body": orjson.dumps(response_data, option=orjson.OPT_SERIALIZE_NUMPY).decode()
         }
 
     except Exception as e:
@@ -148,5 +144,5 @@ def get_dashboard_metrics(event, context):
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Credentials": True
             },
-            "body": json.dumps({"error": f"Ocurrió un error en el servidor: {str(e)}"})
+            "body": orjson.dumps({"error": f"Ocurrió un error en el servidor: {str(e)}"}).decode()
         }
\ No newline at end of file
@@ -0,0 +1,47 @@
+# test_data_service.py
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+
+from data_service import COUNT_BOUNDS, NUMERIC_DTYPE, DynamoDBService, _convert_prices, _to_int
+
+def _build(items):
+    columns = defaultdict(list)
+    n_rows = DynamoDBService._append_items(columns, items, 0)
+    return DynamoDBService._build_dataframe(columns, n_rows)
+
+def test_to_int_accepts_integral_counts():
+    assert _to_int(Decimal('2')) == 2
+    assert _to_int(Decimal('3.0')) == 3
+
+def test_to_int_rejects_missing_and_invalid_counts():
+    assert _to_int(None) == 0
+    assert _to_int('dos') == 0
+    assert _to_int(Decimal('NaN')) == 0
+    assert _to_int(Decimal('Infinity')) == 0
+
+def test_to_int_rejects_non_integral_counts():
+    assert _to_int(Decimal('1.5')) == 0
+
+def test_build_dataframe_does_not_merge_half_bathrooms():
+    df = _build([{'id': '1', 'bathrooms': Decimal('1.5')}, {'id': '2', 'bathrooms': Decimal('1')}])
+    assert df['bathrooms'].tolist() == [0, 1]
+
+def test_to_int_rejects_counts_outside_count_dtype():
+    assert _to_int(Decimal(COUNT_BOUNDS.max)) == COUNT_BOUNDS.max
+    assert _to_int(Decimal(40000)) == 0
+    assert _to_int(Decimal(-40000)) == 0
+
+def test_build_dataframe_survives_out_of_range_bedrooms():
+    df = _build([{'id': '1', 'bedrooms': Decimal(40000)}, {'id': '2', 'bedrooms': Decimal(3)}])
+    assert df['bedrooms'].tolist() == [0, 3]
+
+def test_convert_prices_computes_derived_columns_in_float64():
+    price = np.array([289806, 423958], dtype=NUMERIC_DTYPE)
+    m2 = np.array([0, 80], dtype=NUMERIC_DTYPE)
+    currency_id = np.array([1, 6], dtype=NUMERIC_DTYPE)
+    price_usd, price_per_m2_usd = _convert_prices(price, m2, currency_id, 3.556)
+    assert price_usd.dtype == np.float64
+    assert price_usd.tolist() == [289806.0, 423958 / 3.556]
+    assert price_per_m2_usd.tolist() == [0.0, 423958 / 3.556 / 80]